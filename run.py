@@ -1,8 +1,82 @@
+import bisect
+import calendar
+import csv
+import json
+import os
+import pickle
+import re
+import shutil
+import sys
 import gspread
+from gspread.utils import numericise, numericise_all
 from google.oauth2.service_account import Credentials
-from datetime import datetime
+from datetime import datetime, timedelta
+from time import sleep
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
 from colorama import Fore
 
+# Plain output for terminals without colors (python3 run.py --no-color)
+if "--no-color" in sys.argv or "NO_COLOR" in os.environ:
+    for color in vars(Fore):
+        setattr(Fore, color, "")
+
+# Output rendered once, instead of on every loop
+SEPARATOR = f"{Fore.CYAN}-{Fore.RESET}" * 40
+TRANSACTION_LINE = (f"Date: {Fore.GREEN}{{Date}}{Fore.RESET} | "
+                    f"Type: {Fore.GREEN}{{Type}}{Fore.RESET} | "
+                    f"Category: {Fore.GREEN}{{Category}}{Fore.RESET} | "
+                    f"Amount: {Fore.GREEN}{{Amount}} {{Currency}}{Fore.RESET} | "
+                    f"Description: {Fore.GREEN}{{Description}}{Fore.RESET}")
+TRANSACTION_BLOCK = f"{SEPARATOR}\n{TRANSACTION_LINE}\n"
+ROWS_CHANGED = (f"{Fore.RED}These rows were changed elsewhere since they were loaded{Fore.RESET}. "
+                f"They have been loaded again, please try again.")
+MAIN_MENU = "\n".join([
+    SEPARATOR,
+    f"{Fore.GREEN}1{Fore.RESET}. Set budget",
+    f"{Fore.GREEN}2{Fore.RESET}. View/Edit transactions",
+    f"{Fore.GREEN}3{Fore.RESET}. Generate report",
+    f"{Fore.GREEN}4{Fore.RESET}. Add category",
+    f"{Fore.GREEN}5{Fore.RESET}. Exit",
+    SEPARATOR,
+])
+TRANSACTIONS_MENU = "\n".join([
+    SEPARATOR,
+    "Transactions Menu:",
+    f"{Fore.GREEN}1{Fore.RESET}. Add transaction",
+    f"{Fore.GREEN}2{Fore.RESET}. Update transaction",
+    f"{Fore.GREEN}3{Fore.RESET}. Delete transaction",
+    f"{Fore.GREEN}4{Fore.RESET}. View Transactions",
+    f"{Fore.GREEN}5{Fore.RESET}. Recurring transactions",
+    f"{Fore.GREEN}6{Fore.RESET}. Undo last change",
+    f"{Fore.GREEN}7{Fore.RESET}. Redo last undone change",
+    f"{Fore.GREEN}8{Fore.RESET}. View transactions as of a date",
+    f"{Fore.GREEN}9{Fore.RESET}. Back",
+    SEPARATOR,
+])
+RECURRING_MENU = "\n".join([
+    SEPARATOR,
+    "Recurring Transactions Menu:",
+    f"{Fore.GREEN}1{Fore.RESET}. Add recurring transaction",
+    f"{Fore.GREEN}2{Fore.RESET}. View recurring transactions",
+    f"{Fore.GREEN}3{Fore.RESET}. Add due transactions now",
+    f"{Fore.GREEN}4{Fore.RESET}. Back",
+    SEPARATOR,
+])
+VIEW_MENU = "\n".join([
+    SEPARATOR,
+    f"{Fore.GREEN}1{Fore.RESET}. View transactions ({Fore.GREEN}Month{Fore.RESET})",
+    f"{Fore.GREEN}2{Fore.RESET}. View transactions ({Fore.GREEN}Year{Fore.RESET})",
+    f"{Fore.GREEN}3{Fore.RESET}. Back",
+    SEPARATOR,
+])
+REPORT_MENU = "\n".join([
+    SEPARATOR,
+    f"{Fore.GREEN}1{Fore.RESET}. Generate report ({Fore.GREEN}Month{Fore.RESET})",
+    f"{Fore.GREEN}2{Fore.RESET}. Generate report ({Fore.GREEN}Year{Fore.RESET})",
+    f"{Fore.GREEN}3{Fore.RESET}. Back",
+    SEPARATOR,
+])
+
 # Google Sheets configuration
 SCOPE = [
     "https://www.googleapis.com/auth/spreadsheets",
@@ -16,12 +90,273 @@ SCOPED_CREDS = CREDS.with_scopes(SCOPE)
 GSPREAD_CLIENT = gspread.authorize(SCOPED_CREDS)
 SHEET = GSPREAD_CLIENT.open('smart-budget')
 
-# Categories for transactions
-INCOME_CATEGORIES = {"W": "Wage", "S": "Savings", "O": "Other"}
-EXPENSE_CATEGORIES = {"H": "Housing", "T": "Transport",
-                      "F": "Food", "E": "Entertainment"}
-VALID_CATEGORIES = {"H": "Housing", "T": "Transport",
-                    "F": "Food", "E": "Entertainment", "S": "Savings"}
+# Categories added to a new 'categories' worksheet
+DEFAULT_CATEGORIES = [
+    ["W", "Wage", "income", "N"],
+    ["S", "Savings", "income", "Y"],
+    ["O", "Other", "income", "N"],
+    ["H", "Housing", "expense", "Y"],
+    ["T", "Transport", "expense", "Y"],
+    ["F", "Food", "expense", "Y"],
+    ["E", "Entertainment", "expense", "Y"],
+]
+
+# Worksheet layouts
+TRANSACTION_HEADERS = ["Date", "Type", "Category", "Amount", "Description",
+                       "Currency"]
+BUDGET_HEADERS = ["Category", "Limit", "Currency"]
+RECURRING_HEADERS = ["Start Date", "Frequency", "Type", "Category", "Amount",
+                     "Description", "End Date", "Last Run", "Currency"]
+CATEGORY_HEADERS = ["Key", "Name", "Type", "Budget"]
+HISTORY_HEADERS = ["Time", "Operation", "Index", "Before", "After", "Kind", "Target",
+                   "Status", "Worksheet"]
+CHECKPOINT_HEADERS = ["Seq", "Time", "Part", "Rows"]
+WORKSHEET_HEADERS = {"transactions": TRANSACTION_HEADERS,
+                     "budget": BUDGET_HEADERS,
+                     "recurring": RECURRING_HEADERS,
+                     "categories": CATEGORY_HEADERS,
+                     "history": HISTORY_HEADERS,
+                     "checkpoints": CHECKPOINT_HEADERS}
+WORKSHEET_DEFAULTS = {"categories": DEFAULT_CATEGORIES}
+
+# Currencies. Amounts are reported in the base currency, using the rates
+# (value of one unit in the base currency) from the FX rates file.
+BASE_CURRENCY = os.environ.get("BASE_CURRENCY", "EUR")
+FX_RATES_FILE = "fx_rates.csv"
+
+# Values for columns added to existing worksheets
+COLUMN_DEFAULTS = {"Currency": BASE_CURRENCY}
+
+# Columns with amounts, kept as whole numbers of cents
+MONEY_COLUMNS = ("Amount", "Limit")
+
+# Amounts must be below this, so cents and report totals stay well within
+# the 28 digits decimal arithmetic works with
+MAX_AMOUNT = Decimal(10) ** 12
+
+# Characters ignored in amounts typed or formatted in Google Sheets
+# (e.g. '€12.50', '12.50 $')
+CURRENCY_SYMBOLS = "€$£¥ "
+
+# Recurring transaction frequencies
+FREQUENCIES = {"D": "daily", "W": "weekly", "M": "monthly", "Y": "yearly"}
+
+# Local snapshot of all worksheets, tagged with the spreadsheet revision
+# and the last row of the operation log it includes
+SNAPSHOT_FILE = "ledger.snapshot"
+SNAPSHOT_VERSION = 6
+
+# Operations still waiting for confirmation after this long were interrupted
+# (e.g. the session was closed), so they are checked against the worksheets
+# when a session starts
+RECOVERY_DELAY = timedelta(seconds=15)
+
+# Worksheets loaded on startup and kept in the snapshot
+LEDGER_WORKSHEETS = ("transactions", "budget", "recurring", "categories")
+
+# Append-only log of the changes made by the app in the 'history'
+# worksheet, with checkpoints of all transactions every CHECKPOINT_INTERVAL
+# changes in the 'checkpoints' worksheet. They are kept in the spreadsheet,
+# as local files don't outlast a restart on Heroku. Checkpoints, and the
+# rows of large operations, are split into parts of PART_SIZE characters,
+# as a cell holds at most 50000 characters.
+CHECKPOINT_INTERVAL = 50
+PART_SIZE = 40000
+
+# Worksheets, records, category tables, FX rates and the operation log
+# loaded in this session
+WORKSHEETS = {}
+LEDGER = {}
+CATEGORIES = {}
+FX_RATES = {}
+OPERATIONS = {}
+
+# Revision and last log row the loaded records match, and the log rows
+# written by this session. The revision is None once they no longer match.
+SNAPSHOT = {"revision": None, "history_seq": 0, "own_rows": set()}
+
+
+def get_worksheet(name):
+    """
+    Gets the worksheet with the given name.
+    Creates it with a header row (and default rows, if any) if it doesn't
+    exist yet.
+    Worksheets are kept for the session, as every lookup is a request.
+    """
+    if name not in WORKSHEETS:
+        try:
+            WORKSHEETS[name] = SHEET.worksheet(name)
+        except gspread.exceptions.WorksheetNotFound:
+            headers = WORKSHEET_HEADERS[name]
+            worksheet = SHEET.add_worksheet(title=name, rows=100, cols=len(headers))
+            worksheet.append_rows([headers] + WORKSHEET_DEFAULTS.get(name, []))
+            WORKSHEETS[name] = worksheet
+    return WORKSHEETS[name]
+
+
+def load_ledger(refresh=False):
+    """
+    Loads the records of all worksheets on first use.
+    Uses the local snapshot as-is if the spreadsheet hasn't changed since it
+    was saved. Otherwise everything is downloaded again, as rows may have been
+    changed anywhere in the worksheets, not only added at the end.
+    The revision is read before downloading, so a change made while
+    downloading makes the next start download again.
+    The snapshot is saved again after the app's own changes (see
+    update_snapshot), so they don't make the next start download anything.
+    The snapshot isn't used at all when refreshing.
+    On the first load, operations left pending by interrupted sessions are
+    resolved before anything else is done (see recover_operations). The
+    snapshot never has any, as they change the revision.
+    Returns the records by worksheet name.
+    """
+    if LEDGER:
+        return LEDGER
+
+    revision = SHEET.get_lastUpdateTime()
+    statuses = []
+    snapshot = None
+    if not refresh:
+        try:
+            with open(SNAPSHOT_FILE, "rb") as snapshot_file:
+                snapshot = pickle.load(snapshot_file)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            pass
+
+    if (snapshot and snapshot["version"] == SNAPSHOT_VERSION
+            and snapshot["revision"] == revision):
+        records = snapshot["worksheets"]
+        history_seq = snapshot["history_seq"]
+    else:
+        status_column = chr(ord("A") + HISTORY_HEADERS.index("Status"))
+        times, statuses = get_worksheet("history").batch_get(
+            ["A2:A", f"{status_column}2:{status_column}"])
+        history_seq = len(times)
+        records = {name: download_records(name) for name in LEDGER_WORKSHEETS}
+
+    LEDGER.update(records)
+    SNAPSHOT.update(revision=revision, history_seq=history_seq)
+    save_snapshot(revision)
+    if not refresh and ["pending"] in statuses:
+        recover_operations()
+    return LEDGER
+
+
+def download_records(name):
+    """
+    Downloads all records of the given worksheet.
+    Amounts are converted to cents.
+    Adds columns missing from an older layout to the header row, and fills
+    them in with their default value.
+    Returns the list of records.
+    """
+    worksheet = get_worksheet(name)
+    records = [parse_record(record, f"row {row_number} of '{name}'")
+               for row_number, record in enumerate(worksheet.get_all_records(), start=2)]
+    headers = WORKSHEET_HEADERS[name]
+    current_headers = list(records[0]) if records else worksheet.row_values(1)
+    new_headers = [header for header in headers if header not in current_headers]
+    if not new_headers:
+        return records
+
+    worksheet.update(range_name="A1", values=[headers])
+    for header in new_headers:
+        default = COLUMN_DEFAULTS.get(header, "")
+        for record in records:
+            record[header] = default
+        if default and records:
+            column = chr(ord("A") + headers.index(header))
+            worksheet.update(range_name=f"{column}2:{column}{len(records) + 1}",
+                             values=[[default]] * len(records))
+    return records
+
+
+def save_snapshot(revision):
+    """
+    Saves the loaded records to the local snapshot file, tagged with the
+    revision and the last log row they match.
+    The file is replaced in one step, so a crash never leaves half a snapshot.
+    """
+    snapshot = {"version": SNAPSHOT_VERSION, "revision": revision,
+                "history_seq": SNAPSHOT["history_seq"], "worksheets": LEDGER}
+    try:
+        with open(SNAPSHOT_FILE + ".tmp", "wb") as snapshot_file:
+            pickle.dump(snapshot, snapshot_file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(SNAPSHOT_FILE + ".tmp", SNAPSHOT_FILE)
+    except OSError:
+        pass
+
+
+def snapshot_in_sync():
+    """
+    Checks, right before the app writes to the spreadsheet, that it hasn't
+    changed since the loaded records were last known to match it.
+    """
+    if SNAPSHOT["revision"] is None:
+        return False
+    if SHEET.get_lastUpdateTime() != SNAPSHOT["revision"]:
+        SNAPSHOT["revision"] = None
+    return SNAPSHOT["revision"] is not None
+
+
+def update_snapshot(in_sync):
+    """
+    Saves the snapshot again after the app's own changes, tagged with the
+    new revision, so they don't make the next start download anything.
+    That is only safe if the spreadsheet was unchanged right before the
+    changes (in_sync) and the only new rows in the operation log are this
+    session's, as every change the app makes is logged. Otherwise the
+    snapshot is left as it is and the next start downloads everything.
+    """
+    if not in_sync:
+        SNAPSHOT["revision"] = None
+        return
+    revision = SHEET.get_lastUpdateTime()
+    first_row = SNAPSHOT["history_seq"] + 2
+    new_rows = range(first_row, first_row + len(get_worksheet("history").get(f"A{first_row}:A")))
+    if not set(new_rows) <= SNAPSHOT["own_rows"]:
+        SNAPSHOT["revision"] = None
+        return
+    SNAPSHOT.update(revision=revision, history_seq=first_row + len(new_rows) - 2)
+    save_snapshot(revision)
+
+
+def reload_ledger():
+    """
+    Downloads all worksheets again, after rows were found changed elsewhere.
+    """
+    LEDGER.clear()
+    CATEGORIES.clear()
+    load_ledger(refresh=True)
+
+
+def rows_unchanged(name, records_by_index):
+    """
+    Checks that the rows of the given worksheet at the given record indexes
+    still hold the given records, downloading just those rows in a single
+    request.
+    Rows can be changed or moved by other sessions, or in Google Sheets,
+    after the records were loaded, so this is checked before writing to them.
+    """
+    headers = WORKSHEET_HEADERS[name]
+    last_column = chr(ord("A") + len(headers) - 1)
+    indexes = list(records_by_index)
+    ranges = [f"A{index + 2}:{last_column}{index + 2}" for index in indexes]
+    for index, rows in zip(indexes, get_worksheet(name).batch_get(ranges)):
+        row = rows[0] if rows else []
+        record = parse_record(dict(zip(headers,
+                                       numericise_all(row + [""] * (len(headers) - len(row))))))
+        if record_row(name, record) != record_row(name, records_by_index[index]):
+            return False
+    return True
+
+
+def get_records(name):
+    """
+    Gets all records of the given worksheet.
+    Returns the list of records.
+    """
+    return load_ledger()[name]
 
 
 def get_transactions():
@@ -29,9 +364,728 @@ def get_transactions():
     Gets all transaction records from the worksheet.
     Returns the list of transactions.
     """
-    worksheet = SHEET.worksheet("transactions")
-    transactions = worksheet.get_all_records()
-    return transactions
+    return get_records("transactions")
+
+
+def to_cents(value):
+    """
+    Converts an amount ('12.5', 12.5, 12) to a whole number of cents.
+    Floats are converted through their shortest text form, so 0.1 is
+    exactly 10 cents. Blank values are 0.
+    Currency symbols and thousands separators ('€1,234.50') are ignored.
+    Raises ValueError for anything that isn't a number, or is too large.
+    """
+    if value == "":
+        return 0
+    text = str(value).translate(str.maketrans("", "", CURRENCY_SYMBOLS))
+    if re.fullmatch(r"-?\d{1,3}(,\d{3})+(\.\d*)?", text):
+        text = text.replace(",", "")
+    try:
+        amount = Decimal(text)
+        if not amount.is_finite() or abs(amount) >= MAX_AMOUNT:
+            raise ValueError(f"Invalid amount: {value}")
+        return int((amount * 100).quantize(Decimal(1), ROUND_HALF_UP))
+    except InvalidOperation:
+        raise ValueError(f"Invalid amount: {value}")
+
+
+def parse_amount(text):
+    """
+    Converts an amount entered by the user to cents.
+    Raises ValueError for invalid input, more than 2 decimals or amounts
+    that are too large.
+    """
+    try:
+        amount = Decimal(text.strip())
+        if (not amount.is_finite() or abs(amount) >= MAX_AMOUNT
+                or amount != amount.quantize(Decimal("0.01"))):
+            raise ValueError(f"Invalid amount: {text}")
+    except InvalidOperation:
+        raise ValueError(f"Invalid amount: {text}")
+    return int(amount * 100)
+
+
+def format_amount(cents):
+    """
+    Formats an amount in cents for display, e.g. 123456 as '1234.56'.
+    """
+    sign = "-" if cents < 0 else ""
+    return f"{sign}{abs(cents) // 100}.{abs(cents) % 100:02d}"
+
+
+def convert_cents(cents, rate):
+    """
+    Converts an amount in cents with an exchange rate, rounded to the cent.
+    """
+    return int((cents * rate).quantize(Decimal(1), ROUND_HALF_UP))
+
+
+def parse_record(record, location=None):
+    """
+    Converts the money columns of a downloaded record to cents.
+    Amounts that can't be read are counted as 0, with a warning naming the
+    given location (e.g. "row 5 of 'transactions'"), so one bad cell doesn't
+    stop the app from loading.
+    Returns the record.
+    """
+    for column in MONEY_COLUMNS:
+        if column in record:
+            try:
+                record[column] = to_cents(record[column])
+            except ValueError:
+                if location:
+                    print(f"{Fore.RED}Invalid {column.lower()} '{record[column]}'{Fore.RESET} "
+                          f"in {location}, counted as 0. Please correct it in Google Sheets.")
+                record[column] = 0
+    return record
+
+
+def normalize_row(row):
+    """
+    Returns a row written by the app as it reads back when downloaded: text
+    that looks like a number (e.g. a description of '100') becomes one, as
+    get_all_records does. Amounts are already in cents.
+    """
+    return [numericise(value) if isinstance(value, str) else value for value in row]
+
+
+def sheet_row(name, row):
+    """
+    Converts the money columns of a row for the given worksheet from cents
+    to numbers for Google Sheets.
+    Returns the new row.
+    """
+    return [(value / 100 if value % 100 else value // 100)
+            if header in MONEY_COLUMNS else value
+            for header, value in zip(WORKSHEET_HEADERS[name], row)]
+
+
+def get_fx_rates():
+    """
+    Loads the exchange rates from the FX rates file on first use.
+    Each row gives the value of one unit of a currency in the base currency
+    from that date on.
+    Rows with a missing or invalid date, currency or rate are skipped with
+    a warning.
+    Returns the sorted dates and their rates by currency.
+    """
+    if FX_RATES:
+        return FX_RATES
+
+    rows = {}
+    try:
+        with open(FX_RATES_FILE, newline="") as rates_file:
+            reader = csv.DictReader(rates_file)
+            for row in reader:
+                try:
+                    date = row["Date"].strip()
+                    datetime.strptime(date, "%Y-%m-%d")
+                    currency = row["Currency"].strip().upper()
+                    rate = Decimal(row["Rate"].strip())
+                    if len(currency) != 3 or not currency.isalpha() or not rate.is_finite() or rate <= 0:
+                        raise ValueError
+                except (KeyError, AttributeError, ValueError, InvalidOperation):
+                    print(f"{Fore.RED}Skipping invalid line {reader.line_num}{Fore.RESET} "
+                          f"of {FX_RATES_FILE}: {','.join(str(value) for value in row.values() if value is not None)}")
+                    continue
+                rows.setdefault(currency, []).append((date, rate))
+    except OSError:
+        pass
+
+    for currency, rates in rows.items():
+        rates.sort()
+        FX_RATES[currency] = ([date for date, _ in rates], [rate for _, rate in rates])
+    return FX_RATES
+
+
+def get_fx_rate(currency, date):
+    """
+    Gets the rate of a currency on the given date ('YYYY-MM-DD').
+    Returns None if there is no rate on or before that date.
+    """
+    if currency == BASE_CURRENCY:
+        return Decimal(1)
+    dates, rates = get_fx_rates().get(currency, ((), ()))
+    index = bisect.bisect_right(dates, date)
+    return rates[index - 1] if index else None
+
+
+def convert_totals(totals):
+    """
+    Converts amounts added up by (currency, date, category code) to the base
+    currency.
+    Each currency is converted as one batch: its dates are sorted and matched
+    against its rate table in a single pass, so rates are looked up once per
+    date, not once per transaction. Base currency amounts aren't converted.
+    Returns the (category code, amount) pairs and the currencies without rates.
+    """
+    by_currency = {}
+    for (currency, date, code), amount in totals.items():
+        by_currency.setdefault(currency, []).append((date, code, amount))
+
+    converted = []
+    missing = set()
+    for currency, group in by_currency.items():
+        if currency == BASE_CURRENCY:
+            converted.extend((code, amount) for _, code, amount in group)
+            continue
+        dates, rates = get_fx_rates().get(currency, ((), ()))
+        group.sort(key=lambda item: item[0])
+        i = 0
+        rate = None
+        for date, code, amount in group:
+            while i < len(dates) and dates[i] <= date:
+                rate = rates[i]
+                i += 1
+            if rate is None:
+                missing.add(currency)
+            else:
+                converted.append((code, convert_cents(amount, rate)))
+    return converted, missing
+
+
+def input_currency(text):
+    """
+    Asks the user to enter a currency code.
+    Uses the base currency if user presses enter.
+    Warns if the FX rates file has no rates for the currency.
+    Returns the currency code.
+    """
+    while True:
+        currency = input(
+            f"{text} ({Fore.GREEN}e.g. USD{Fore.RESET}) or press "
+            f"'{Fore.GREEN}Enter{Fore.RESET}' for {Fore.GREEN}{BASE_CURRENCY}{Fore.RESET}:\n"
+        ).strip().upper()
+        if not currency:
+            currency = BASE_CURRENCY
+        if len(currency) != 3 or not currency.isalpha():
+            print(f"{Fore.RED}Invalid currency{Fore.RESET}. Please enter a "
+                  f"{Fore.GREEN}3 letter{Fore.RESET} currency code.")
+            continue
+        if currency != BASE_CURRENCY and currency not in get_fx_rates():
+            print(f"{Fore.RED}No exchange rates for {currency}{Fore.RESET} in {FX_RATES_FILE}. "
+                  f"Amounts in {currency} are left out of reports until rates are added.")
+        print(f"Currency set to: {Fore.GREEN}{currency}{Fore.RESET}")
+        return currency
+
+
+def get_transactions_in_period(period):
+    """
+    Gets the transactions for a month ('YYYY-MM') or a year ('YYYY').
+    Dates are stored as 'YYYY-MM-DD', so they are matched by prefix
+    instead of parsing every date.
+    Returns the list of transactions.
+    """
+    return [t for t in get_transactions() if str(t['Date']).startswith(period)]
+
+
+def format_transaction(transaction, template=TRANSACTION_LINE):
+    """
+    Renders a transaction with the given pre-rendered template.
+    Amounts are formatted from cents here, only for display.
+    """
+    return template.format_map({**transaction, "Amount": format_amount(transaction["Amount"])})
+
+
+def show_pages(records, render):
+    """
+    Displays the records rendered by the given function, one page at a time.
+    Only the records on a page are rendered, and each page is sent to the
+    terminal in a single write.
+    Asks the user before showing the next page, so large views can be stopped.
+    """
+    page_size = max(1, (shutil.get_terminal_size().lines - 2) // 3)
+    for start in range(0, len(records), page_size):
+        page = records[start:start + page_size]
+        sys.stdout.write("".join(render(record) for record in page))
+        sys.stdout.flush()
+        end = start + len(page)
+        if end < len(records):
+            more = input(f"Showing {Fore.GREEN}{start + 1}-{end}{Fore.RESET} of "
+                         f"{Fore.GREEN}{len(records)}{Fore.RESET}. Press "
+                         f"'{Fore.GREEN}Enter{Fore.RESET}' for more or "
+                         f"({Fore.RED}Q{Fore.RESET}) to stop:\n").upper()
+            if more == "Q":
+                break
+
+
+def append_records(name, rows, kind="do", target=None):
+    """
+    Adds the rows to the end of the given worksheet in a single request
+    and to the loaded records.
+    Returns True.
+    """
+    return insert_records(name, len(get_records(name)), rows, kind, target)
+
+
+def insert_records(name, index, rows, kind="do", target=None):
+    """
+    Inserts the rows at the given record index in the given worksheet
+    in a single request and in the loaded records.
+    Changes are written to the operation log first, and confirmed in it
+    once they reached Google Sheets. Both get the rows as they read back
+    (see normalize_row), so they match downloaded records.
+    Returns False, after loading everything again, if the row at the index
+    was changed elsewhere.
+    """
+    records = get_records(name)
+    if index < len(records) and not rows_unchanged(name, {index: records[index]}):
+        reload_ledger()
+        return False
+    in_sync = snapshot_in_sync()
+    normalized = [normalize_row(row) for row in rows]
+    seqs = log_operations(name, [("insert", index, [], normalized)], kind, target)
+    try:
+        if index == len(records):
+            get_worksheet(name).append_rows([sheet_row(name, row) for row in rows])
+        else:
+            get_worksheet(name).insert_rows([sheet_row(name, row) for row in rows],
+                                            row=index + 2)
+    except Exception:
+        fail_operations(seqs)
+        SNAPSHOT["revision"] = None
+        raise
+    records[index:index] = [dict(zip(WORKSHEET_HEADERS[name], row)) for row in normalized]
+    confirm_operations(seqs)
+    update_snapshot(in_sync)
+    return True
+
+
+def update_records(name, rows_by_index, kind="do", target=None):
+    """
+    Replaces the rows at the given record indexes in the given worksheet
+    in a single request and in the loaded records.
+    Changes are written to the operation log first, and confirmed in it
+    once they reached Google Sheets. Both get the rows as they read back
+    (see normalize_row), so they match downloaded records.
+    Returns False, after loading everything again, if any of the rows
+    was changed elsewhere.
+    """
+    records = get_records(name)
+    if not rows_unchanged(name, {index: records[index] for index in rows_by_index}):
+        reload_ledger()
+        return False
+    headers = WORKSHEET_HEADERS[name]
+    last_column = chr(ord("A") + len(headers) - 1)
+    in_sync = snapshot_in_sync()
+    normalized = {index: normalize_row(row) for index, row in rows_by_index.items()}
+    seqs = log_operations(name, [("update", index, [record_row(name, records[index])], [row])
+                                 for index, row in normalized.items()], kind, target)
+    try:
+        get_worksheet(name).batch_update([
+            {"range": f"A{index + 2}:{last_column}{index + 2}", "values": [sheet_row(name, row)]}
+            for index, row in rows_by_index.items()
+        ])
+    except Exception:
+        fail_operations(seqs)
+        SNAPSHOT["revision"] = None
+        raise
+    for index, row in normalized.items():
+        records[index] = dict(zip(headers, row))
+    confirm_operations(seqs)
+    update_snapshot(in_sync)
+    return True
+
+
+def delete_records(name, index, count=1, kind="do", target=None):
+    """
+    Deletes the rows from the given record index from the given worksheet
+    in a single request and from the loaded records.
+    Changes are written to the operation log first, and confirmed in it
+    once they reached Google Sheets.
+    Returns False, after loading everything again, if any of the rows
+    was changed elsewhere.
+    """
+    records = get_records(name)
+    if not rows_unchanged(name, {i: records[i] for i in range(index, index + count)}):
+        reload_ledger()
+        return False
+    in_sync = snapshot_in_sync()
+    before = [record_row(name, record) for record in records[index:index + count]]
+    seqs = log_operations(name, [("delete", index, before, [])], kind, target)
+    try:
+        get_worksheet(name).delete_rows(index + 2, index + 1 + count)
+    except Exception:
+        fail_operations(seqs)
+        SNAPSHOT["revision"] = None
+        raise
+    del records[index:index + count]
+    confirm_operations(seqs)
+    update_snapshot(in_sync)
+    return True
+
+
+def record_row(name, record):
+    """
+    Returns the values of a record in the column order of the given worksheet.
+    """
+    return [record[header] for header in WORKSHEET_HEADERS[name]]
+
+
+def get_operations():
+    """
+    Loads the operation log from the 'history' worksheet on first use.
+    Only changes to transactions can be undone or viewed by date.
+    Rebuilds the undo and redo stacks from the kind of each confirmed
+    operation. Operations still pending are left out: those of interrupted
+    sessions were resolved when this session started, and the others are
+    still being sent. Only the headers of the checkpoints are read.
+    Returns the log.
+    """
+    if OPERATIONS:
+        return OPERATIONS
+
+    entries = {seq: entry for seq, entry in read_operations().items()
+               if entry["status"] == "done"}
+    OPERATIONS.update(entries=entries, undo=[], redo=[])
+    for seq in sorted(entries):
+        stack_operation(entries[seq])
+
+    checkpoints = {}
+    rows = get_worksheet("checkpoints").get("A2:C")
+    for row_number, row in enumerate(rows, start=2):
+        try:
+            seq = int(row[0])
+            time = row[1]
+        except (IndexError, ValueError):
+            continue
+        checkpoint = checkpoints.setdefault(seq, {"seq": seq, "time": time, "rows": []})
+        checkpoint["rows"].append(row_number)
+    OPERATIONS["checkpoints"] = sorted(checkpoints.values(),
+                                       key=lambda checkpoint: checkpoint["seq"])
+    return OPERATIONS
+
+
+def read_operations():
+    """
+    Downloads the operations of the log that are done or pending.
+    The number of each operation is its row in the log, less the header.
+    Rows of large operations continue on 'part' rows below them. Values are
+    read as text, so no part is mistaken for a number.
+    Returns the operations by number.
+    """
+    records = []
+    for seq, record in enumerate(
+            get_worksheet("history").get_all_records(numericise_ignore=["all"]), start=1):
+        if record["Operation"] != "part":
+            records.append((seq, record))
+        elif records:
+            records[-1][1]["Before"] += record["Before"]
+            records[-1][1]["After"] += record["After"]
+
+    entries = {}
+    for seq, record in records:
+        if record["Status"] not in ("done", "pending"):
+            continue
+        try:
+            entry = {"seq": seq, "time": record["Time"], "op": record["Operation"],
+                     "index": int(record["Index"]), "before": json.loads(record["Before"]),
+                     "after": json.loads(record["After"]), "kind": record["Kind"],
+                     "target": int(record["Target"]) if record["Target"] else None,
+                     "status": record["Status"],
+                     "worksheet": record.get("Worksheet") or "transactions"}
+        except (ValueError, TypeError):
+            # Row edited by hand
+            continue
+        if entry["worksheet"] in LEDGER_WORKSHEETS:
+            entries[seq] = entry
+    return entries
+
+
+def recover_operations():
+    """
+    Marks the operations left pending by interrupted sessions as done or
+    failed, when the session starts and before it writes anything.
+    Each one is checked against its worksheet as it was right after it,
+    rebuilt from the downloaded records by undoing the later operations from
+    the last one back, so later changes to the same rows can't be mistaken
+    for it. Operations logged less than RECOVERY_DELAY ago may still be on
+    their way from another session, so they are waited for first.
+    """
+    entries = read_operations()
+    pending = [entry["time"] for entry in entries.values() if entry["status"] == "pending"]
+    if not pending:
+        return
+    wait = (datetime.fromisoformat(max(pending)) + RECOVERY_DELAY - datetime.now()).total_seconds()
+    if wait > 0:
+        print("Waiting for changes still being saved by another session...")
+        sleep(wait)
+        reload_ledger()
+        entries = read_operations()
+
+    interrupted = (datetime.now() - RECOVERY_DELAY).isoformat(timespec="seconds")
+    worksheets = {name: [record_row(name, record) for record in get_records(name)]
+                  for name in LEDGER_WORKSHEETS}
+    pending = [seq for seq, entry in entries.items() if entry["status"] == "pending"]
+    if not pending:
+        return
+    recovered = {"done": [], "failed": []}
+    for seq in sorted(entries, reverse=True):
+        if seq < min(pending):
+            break
+        entry = entries[seq]
+        rows = worksheets[entry["worksheet"]]
+        if entry["status"] == "pending":
+            applied = operation_applied(entry, rows)
+            if entry["time"] <= interrupted:
+                recovered["done" if applied else "failed"].append(seq)
+            if not applied:
+                continue
+        index = entry["index"]
+        rows[index:index + len(entry["after"])] = entry["before"]
+
+    in_sync = snapshot_in_sync()
+    for status, seqs in recovered.items():
+        set_operations_status(seqs, status)
+    update_snapshot(in_sync)
+
+
+def operation_applied(entry, rows):
+    """
+    Checks whether a logged operation reached its worksheet, given the rows
+    of the worksheet right after it: its new rows are in place and the rows
+    it replaced or deleted are gone.
+    """
+    index = entry["index"]
+    if entry["after"] and rows[index:index + len(entry["after"])] != entry["after"]:
+        return False
+    return (not entry["before"] or entry["before"] == entry["after"]
+            or rows[index:index + len(entry["before"])] != entry["before"])
+
+
+def stack_operation(entry):
+    """
+    Updates the undo and redo stacks of the loaded log with a confirmed
+    operation on transactions. Skipped operations are removed from both stacks.
+    """
+    if entry["worksheet"] != "transactions":
+        return
+    undo = OPERATIONS["undo"]
+    redo = OPERATIONS["redo"]
+    target = entry["target"]
+    if entry["kind"] == "do":
+        undo.append(entry["seq"])
+        redo.clear()
+    elif entry["kind"] == "undo" and target in undo:
+        undo.remove(target)
+        redo.append(target)
+    elif entry["kind"] == "redo" and target in redo:
+        redo.remove(target)
+        undo.append(target)
+    elif entry["kind"] == "skip":
+        for stack in (undo, redo):
+            if target in stack:
+                stack.remove(target)
+
+
+def split_parts(text):
+    """
+    Splits text into parts of at most PART_SIZE characters, so each fits
+    in a cell. Returns at least one part.
+    """
+    return [text[i:i + PART_SIZE] for i in range(0, len(text), PART_SIZE)] or [""]
+
+
+def appended_rows(response):
+    """
+    Returns the numbers of the rows added by an append_rows request.
+    """
+    first, last = re.search(r"![A-Z]+(\d+)(?::[A-Z]+(\d+))?$",
+                            response["updates"]["updatedRange"]).groups()
+    return range(int(first), int(last or first) + 1)
+
+
+def log_operations(name, operations, kind="do", target=None):
+    """
+    Appends operations on the given worksheet to the operation log as
+    pending, in a single request, before they are sent to Google Sheets.
+    Each operation is an (op, index, before, after) tuple.
+    The number of an operation comes from the first row it was appended to,
+    so operations logged by different sessions at the same time never get
+    the same number. Rows too large for a cell (e.g. a year of recurring
+    transactions) continue on 'part' rows below it.
+    Saves a checkpoint of the transactions before the first operation and
+    every CHECKPOINT_INTERVAL operations.
+    Returns the numbers of the operations.
+    """
+    time = datetime.now().isoformat(timespec="seconds")
+    log_rows = []
+    offsets = []
+    for op, index, before, after in operations:
+        before_parts = split_parts(json.dumps(before, separators=(",", ":")))
+        after_parts = split_parts(json.dumps(after, separators=(",", ":")))
+        offsets.append(len(log_rows))
+        log_rows.append([time, op, index, before_parts[0], after_parts[0], kind,
+                         "" if target is None else target, "pending", name])
+        for part in range(1, max(len(before_parts), len(after_parts))):
+            log_rows.append([time, "part", "", "".join(before_parts[part:part + 1]),
+                             "".join(after_parts[part:part + 1]), "", "", "", name])
+    rows = appended_rows(get_worksheet("history").append_rows(log_rows))
+    SNAPSHOT["own_rows"].update(rows)
+    seqs = [rows[offset] - 1 for offset in offsets]
+    if any((row - 2) % CHECKPOINT_INTERVAL == 0 for row in rows):
+        save_checkpoint(seqs[0] - 1, time)
+    if OPERATIONS:
+        for seq, (op, index, before, after) in zip(seqs, operations):
+            OPERATIONS["entries"][seq] = {"seq": seq, "time": time, "op": op, "index": index,
+                                          "before": before, "after": after, "kind": kind,
+                                          "target": target, "status": "pending",
+                                          "worksheet": name}
+    return seqs
+
+
+def confirm_operations(seqs):
+    """
+    Marks logged operations as done, once they reached Google Sheets,
+    and adds them to the undo and redo stacks.
+    """
+    set_operations_status(seqs, "done")
+    if OPERATIONS:
+        for seq in seqs:
+            entry = OPERATIONS["entries"][seq]
+            entry["status"] = "done"
+            stack_operation(entry)
+
+
+def fail_operations(seqs):
+    """
+    Marks logged operations as failed, when they couldn't be sent to
+    Google Sheets.
+    """
+    set_operations_status(seqs, "failed")
+    for seq in seqs:
+        OPERATIONS.get("entries", {}).pop(seq, None)
+
+
+def set_operations_status(seqs, status):
+    """
+    Sets the status of logged operations in a single request.
+    """
+    if not seqs:
+        return
+    status_column = chr(ord("A") + HISTORY_HEADERS.index("Status"))
+    get_worksheet("history").batch_update([
+        {"range": f"{status_column}{seq + 1}", "values": [[status]]} for seq in seqs
+    ])
+
+
+def skip_operation(seq):
+    """
+    Logs that an operation can no longer be undone or redone, as its
+    transactions were changed outside the app, so it is left out of the
+    undo and redo stacks from now on.
+    """
+    entry = get_operations()["entries"][seq]
+    in_sync = snapshot_in_sync()
+    confirm_operations(log_operations("transactions", [("skip", entry["index"], [], [])],
+                                      "skip", seq))
+    update_snapshot(in_sync)
+
+
+def save_checkpoint(seq, time):
+    """
+    Appends all transactions to the 'checkpoints' worksheet, as the state
+    of the ledger after the operation with the given number.
+    The transactions are downloaded again first, so changes made by other
+    sessions are included.
+    """
+    records = get_worksheet("transactions").get_all_records()
+    data = json.dumps([record_row("transactions", parse_record(record)) for record in records],
+                      separators=(",", ":"))
+    parts = split_parts(data)
+    response = get_worksheet("checkpoints").append_rows(
+        [[seq, time, part, rows] for part, rows in enumerate(parts)])
+    if OPERATIONS:
+        OPERATIONS["checkpoints"].append({"seq": seq, "time": time,
+                                          "rows": list(appended_rows(response))})
+
+
+def get_ledger_as_of(time):
+    """
+    Rebuilds the transactions as they were at the given time
+    ('YYYY-MM-DDTHH:MM:SS') from the nearest earlier checkpoint, replaying the
+    logged operations made after it.
+    Only the parts of that checkpoint are downloaded.
+    Returns the list of transactions, or None if the log starts later.
+    """
+    operations = get_operations()
+    earlier = [checkpoint for checkpoint in operations["checkpoints"]
+               if checkpoint["time"] <= time]
+    if not earlier:
+        return None
+    checkpoint = max(earlier, key=lambda checkpoint: checkpoint["seq"])
+
+    rows_column = chr(ord("A") + CHECKPOINT_HEADERS.index("Rows"))
+    parts = get_worksheet("checkpoints").get(
+        f"{rows_column}{checkpoint['rows'][0]}:{rows_column}{checkpoint['rows'][-1]}")
+    rows = json.loads("".join(part[0] for part in parts if part))
+
+    for seq in sorted(operations["entries"]):
+        entry = operations["entries"][seq]
+        if (seq <= checkpoint["seq"] or entry["status"] != "done"
+                or entry["worksheet"] != "transactions"):
+            continue
+        if entry["time"] > time:
+            break
+        index = entry["index"]
+        rows[index:index + len(entry["before"])] = entry["after"]
+    return [dict(zip(TRANSACTION_HEADERS, row)) for row in rows]
+
+
+def get_categories():
+    """
+    Builds the category lookup tables from the 'categories' worksheet on first use.
+    Every category gets an integer code, used by reports to add up amounts.
+    For each group (income, expense and budget) it keeps a key -> code table,
+    the colored choices for prompts and the valid keys for error messages,
+    so they aren't rebuilt on every prompt.
+    Returns the tables.
+    """
+    if CATEGORIES:
+        return CATEGORIES
+
+    names = []
+    codes = {}
+    groups = {"income": {}, "expense": {}, "budget": {}}
+    rows = get_records("categories")
+    for row in sorted(rows, key=lambda row: row["Type"] != "expense"):
+        key = str(row["Key"]).strip().upper()
+        name = str(row["Name"]).strip()
+        if row["Type"] not in ("income", "expense") or not key or not name:
+            continue
+        code = codes.setdefault(name, len(names))
+        if code == len(names):
+            names.append(name)
+        groups[row["Type"]].setdefault(key, code)
+        if str(row["Budget"]).upper() == "Y":
+            groups["budget"].setdefault(key, code)
+
+    CATEGORIES.update(names=names, codes=codes, other={}, **groups)
+    CATEGORIES["choices"] = {
+        group: ", ".join(f"({Fore.GREEN}{key}{Fore.RESET}) {names[code]}"
+                         for key, code in keys.items())
+        for group, keys in groups.items()
+    }
+    CATEGORIES["keys"] = {
+        group: f"{Fore.GREEN}{', '.join(keys)}{Fore.RESET}"
+        for group, keys in groups.items()
+    }
+    return CATEGORIES
+
+
+def category_code(name):
+    """
+    Gets the code of a category by name.
+    Categories only found in the other worksheets (e.g. removed from the
+    'categories' worksheet) get a new code in a separate table, so they can
+    still be reported but can be added again as new categories.
+    """
+    categories = get_categories()
+    code = categories["codes"].get(name)
+    if code is None:
+        other = categories["other"]
+        code = other.setdefault(name, len(categories["names"]) + len(other))
+    return code
 
 
 def set_budget():
@@ -41,28 +1095,21 @@ def set_budget():
     Error if enter anything other than a number or invalid category.
     Checks if a budget is already set for the chosen category.
     """
-    worksheet = SHEET.worksheet("budget")
-    budget_data = worksheet.get_all_records()
+    budget_data = get_records("budget")
     existing_categories = {item["Category"] for item in budget_data}
+    categories = get_categories()
 
     # Prompt for category
     while True:
-        print(f"{Fore.CYAN}-{Fore.RESET}" * 40)
+        print(SEPARATOR)
         category_key = input(
-            f"Enter the category: ({Fore.GREEN}H{Fore.RESET}) Housing, "
-            f"({Fore.GREEN}T{Fore.RESET}) Transport, ({Fore.GREEN}F{Fore.RESET}) Food, "
-            f"({Fore.GREEN}E{Fore.RESET}) Entertainment, ({Fore.GREEN}S{Fore.RESET}) Savings\n"
-        ).upper()
-        if category_key in VALID_CATEGORIES:
-            category = VALID_CATEGORIES[category_key]
+            f"Enter the category: {categories['choices']['budget']}\n").upper()
+        if category_key in categories["budget"]:
+            category = categories["names"][categories["budget"][category_key]]
             break
         else:
-            print(
-                f"{Fore.RED}Invalid category{Fore.RESET}. Please choose from "
-                f"{Fore.GREEN}H{Fore.RESET} (Housing), {Fore.GREEN}T{Fore.RESET} (Transport), "
-                f"{Fore.GREEN}F{Fore.RESET} (Food), {Fore.GREEN}E{Fore.RESET} (Entertainment), "
-                f"{Fore.GREEN}S{Fore.RESET} (Savings)."
-            )
+            print(f"{Fore.RED}Invalid category{Fore.RESET}. Please choose from "
+                  f"{categories['keys']['budget']}.")
 
     # Check for existing budget
     if category in existing_categories:
@@ -74,11 +1121,14 @@ def set_budget():
             print(f"{Fore.GREEN}Budget not changed{Fore.RESET}.")
             return
 
+    # Prompt for currency
+    currency = input_currency(f"Enter the currency of the budget for {Fore.GREEN}{category}{Fore.RESET}")
+
     # Prompt for budget limit
     while True:
-        print(f"{Fore.CYAN}-{Fore.RESET}" * 40)
+        print(SEPARATOR)
         try:
-            limit = float(input(
+            limit = parse_amount(input(
                 f"Enter the budget limit for {Fore.GREEN}{category}{Fore.RESET}:\n"))
             if limit <= 0:
                 raise ValueError(
@@ -92,14 +1142,72 @@ def set_budget():
     if category in existing_categories:
         for i, item in enumerate(budget_data):
             if item["Category"] == category:
-                worksheet.update_cell(i + 2, 2, limit)
+                if not update_records("budget", {i: [category, limit, currency]}):
+                    print(ROWS_CHANGED)
+                    return
                 break
         print(f"Budget limit for {Fore.GREEN}{category}{Fore.RESET} updated to "
-              f"{Fore.GREEN}{limit}{Fore.RESET}")
+              f"{Fore.GREEN}{format_amount(limit)} {currency}{Fore.RESET}")
     else:
-        worksheet.append_row([category, limit])
+        append_records("budget", [[category, limit, currency]])
         print(f"Budget limit for {Fore.GREEN}{category}{Fore.RESET} set to "
-              f"{Fore.GREEN}{limit}{Fore.RESET}")
+              f"{Fore.GREEN}{format_amount(limit)} {currency}{Fore.RESET}")
+
+
+def add_category():
+    """
+    Asks the user to enter a new category.
+    Adds the category to the 'categories' worksheet.
+    Handles single key inputs for the category type and checks that the key
+    and name aren't already used.
+    """
+    categories = get_categories()
+
+    # Prompt for category type
+    while True:
+        print(SEPARATOR)
+        category_type = input(
+            f"Enter the type: ({Fore.GREEN}I{Fore.RESET}) Income, "
+            f"({Fore.GREEN}E{Fore.RESET}) Expense:\n"
+        ).upper()
+        if category_type in ["I", "E"]:
+            category_type = "income" if category_type == "I" else "expense"
+            print(f"Category type set to: {Fore.GREEN}{category_type}{Fore.RESET}")
+            break
+        else:
+            print(f"{Fore.RED}Invalid type{Fore.RESET}. Please enter "
+                  f"({Fore.GREEN}I{Fore.RESET}) for Income or ({Fore.GREEN}E{Fore.RESET}) for Expense.")
+
+    # Prompt for budget
+    budget = input(f"Can a budget be set for this category? "
+                   f"({Fore.GREEN}Y{Fore.RESET}/{Fore.RED}N{Fore.RESET}):\n").upper()
+    budget = "Y" if budget == "Y" else "N"
+
+    # Prompt for key
+    while True:
+        key = input("Enter a single letter key for the category:\n").strip().upper()
+        if len(key) != 1 or not key.isalpha():
+            print(f"{Fore.RED}Invalid key{Fore.RESET}. Please enter a single letter.")
+        elif key in categories[category_type] or (budget == "Y" and key in categories["budget"]):
+            print(f"{Fore.RED}Key already used{Fore.RESET}. Used keys: "
+                  f"{categories['keys'][category_type]}"
+                  + (f", {categories['keys']['budget']}" if budget == "Y" else "") + ".")
+        else:
+            break
+
+    # Prompt for name
+    while True:
+        name = input("Enter the category name:\n").strip()
+        if not name:
+            print(f"{Fore.RED}Name cannot be empty{Fore.RESET}. Please enter a valid name.")
+        elif name in categories["codes"]:
+            print(f"{Fore.RED}Category {name} already exists{Fore.RESET}.")
+        else:
+            break
+
+    append_records("categories", [[key, name, category_type, budget]])
+    CATEGORIES.clear()
+    print(f"Category {Fore.GREEN}{name}{Fore.RESET} added.")
 
 
 def add_transaction():
@@ -136,12 +1244,8 @@ def add_transaction():
         if transaction_type in ["I", "E"]:
             if transaction_type == "I":
                 transaction_type = "income"
-                categories = INCOME_CATEGORIES
-                print(f"Choose a category: ({Fore.GREEN}W{Fore.RESET}) Wage, "
-                      f"({Fore.GREEN}S{Fore.RESET}) Savings, ({Fore.GREEN}O{Fore.RESET}) Other:")
             else:
                 transaction_type = "expense"
-                categories = EXPENSE_CATEGORIES
             print(f"Transaction type set to: {Fore.GREEN}{transaction_type}{Fore.RESET}")
             break
         else:
@@ -149,32 +1253,29 @@ def add_transaction():
                   f"({Fore.GREEN}I{Fore.RESET}) for Income or ({Fore.GREEN}E{Fore.RESET}) for Expense.")
 
     # Prompt for category
-    if transaction_type == "income":
-        print(f"Choose a category: ({Fore.GREEN}W{Fore.RESET}) Wage, "
-              f"({Fore.GREEN}S{Fore.RESET}) Savings, ({Fore.GREEN}O{Fore.RESET}) Other:")
-    else:
-        print(f"Choose a category: ({Fore.GREEN}H{Fore.RESET}) Housing, "
-              f"({Fore.GREEN}T{Fore.RESET}) Transport, ({Fore.GREEN}F{Fore.RESET}) Food, "
-              f"({Fore.GREEN}E{Fore.RESET}) Entertainment")
+    categories = get_categories()
+    print(f"Choose a category: {categories['choices'][transaction_type]}")
 
     while True:
         category_key = input("Enter the category:\n").upper()
-        if category_key in categories:
-            category = categories[category_key]
+        if category_key in categories[transaction_type]:
+            category = categories["names"][categories[transaction_type][category_key]]
             print(f"Category set to: {Fore.GREEN}{category}{Fore.RESET}")
             break
         else:
-            print(f"{Fore.RED}Invalid category{Fore.RESET}. Please choose from Wage "
-                  f"({Fore.GREEN}W{Fore.RESET}), Savings ({Fore.GREEN}S{Fore.RESET}), "
-                  f"Other ({Fore.GREEN}O{Fore.RESET}).")
+            print(f"{Fore.RED}Invalid category{Fore.RESET}. Please choose from "
+                  f"{categories['keys'][transaction_type]}.")
+
+    # Prompt for currency
+    currency = input_currency("Enter the currency")
 
     # Prompt for amount
     while True:
         try:
-            amount = float(input("Enter the amount:\n"))
+            amount = parse_amount(input("Enter the amount:\n"))
             if amount <= 0:
                 raise ValueError(f"Amount must be a {Fore.GREEN}positive number{Fore.RESET}.")
-            print(f"Amout set to: {Fore.GREEN}{amount}{Fore.RESET}")
+            print(f"Amout set to: {Fore.GREEN}{format_amount(amount)}{Fore.RESET}")
             break
         except ValueError:
             print(f"{Fore.RED}Invalid input!{Fore.RESET} Please enter a "
@@ -193,7 +1294,7 @@ def add_transaction():
     print(f"\nTransaction Summary - Date: {Fore.GREEN}{date}{Fore.RESET} | "
           f"Type: {Fore.GREEN}{transaction_type}{Fore.RESET} | "
           f"Category: {Fore.GREEN}{category}{Fore.RESET} | Amount: "
-          f"{Fore.GREEN}{amount}{Fore.RESET} | Description: "
+          f"{Fore.GREEN}{format_amount(amount)} {currency}{Fore.RESET} | Description: "
           f"{Fore.GREEN}{description}{Fore.RESET}\n")
 
     # Confirm save
@@ -201,8 +1302,8 @@ def add_transaction():
         confirm = input(f"Do you want to save this transaction? "
                         f"({Fore.GREEN}Y{Fore.RESET}/{Fore.RED}N{Fore.RESET}): ").upper()
         if confirm == 'Y':
-            worksheet = SHEET.worksheet("transactions")
-            worksheet.append_row([date, transaction_type, category, amount, description])
+            append_records("transactions", [[date, transaction_type, category, amount, description,
+                                             currency]])
             print(f"{Fore.GREEN}Transaction added successfully!{Fore.RESET}")
             break
         elif confirm == 'N':
@@ -233,7 +1334,6 @@ def update_transaction():
 
     # Fetch transactions and filter by date
     transactions = get_transactions()
-    worksheet = SHEET.worksheet("transactions")
     transactions_on_date = [t for t in transactions if t["Date"] == date]
 
     if not transactions_on_date:
@@ -242,11 +1342,9 @@ def update_transaction():
 
     # Display transactions on the selected date
     print("Transactions on this date:")
-    print(f"{Fore.CYAN}-{Fore.RESET}" * 40)
+    print(SEPARATOR)
     for idx, transaction in enumerate(transactions_on_date, start=1):
-        print(f"{idx}. Date: {Fore.GREEN}{transaction['Date']}{Fore.RESET} | Type: {Fore.GREEN}{transaction['Type']}{Fore.RESET} | "
-              f"Category: {Fore.GREEN}{transaction['Category']}{Fore.RESET} | Amount: {Fore.GREEN}{transaction['Amount']}{Fore.RESET} | "
-              f"Description: {Fore.GREEN}{transaction['Description']}{Fore.RESET}")
+        print(f"{idx}. " + format_transaction(transaction))
 
     # Prompt for transaction number to update
     while True:
@@ -261,9 +1359,7 @@ def update_transaction():
             print(f"{Fore.RED}Invalid input{Fore.RESET}. Please enter a number.")
 
     # Display selected transaction details
-    print(f"Selected transaction: Date: {Fore.GREEN}{selected_transaction['Date']}{Fore.RESET} | "
-          f"Type: {Fore.GREEN}{selected_transaction['Type']}{Fore.RESET} | Category: {Fore.GREEN}{selected_transaction['Category']}{Fore.RESET} | "
-          f"Amount: {Fore.GREEN}{selected_transaction['Amount']}{Fore.RESET} | Description: {Fore.GREEN}{selected_transaction['Description']}{Fore.RESET}")
+    print("Selected transaction: " + format_transaction(selected_transaction))
 
     # Prompt for new transaction type
     while True:
@@ -273,37 +1369,36 @@ def update_transaction():
         if transaction_type in ["I", "E"]:
             if transaction_type == "I":
                 transaction_type = "income"
-                categories = INCOME_CATEGORIES
             else:
                 transaction_type = "expense"
-                categories = EXPENSE_CATEGORIES
             print(f"Transaction type set to: {Fore.GREEN}{transaction_type}{Fore.RESET}")
             break
         else:
             print(f"{Fore.RED}Invalid type{Fore.RESET}. Please enter ({Fore.GREEN}I{Fore.RESET}) Income or ({Fore.GREEN}E{Fore.RESET}) Expense.")
 
     # Prompt for new category
-    if transaction_type == "income":
-        print(f"Choose a new category: ({Fore.GREEN}W{Fore.RESET}) Wage, ({Fore.GREEN}S{Fore.RESET}) Savings, ({Fore.GREEN}O{Fore.RESET}) Other")
-    else:
-        print(f"Choose a new category: ({Fore.GREEN}H{Fore.RESET}) Housing, ({Fore.GREEN}T{Fore.RESET}) Transport, ({Fore.GREEN}F{Fore.RESET}) Food, ({Fore.GREEN}E{Fore.RESET}) Entertainment")
+    categories = get_categories()
+    print(f"Choose a new category: {categories['choices'][transaction_type]}")
 
     while True:
         category_key = input("Enter the new category:\n").upper()
-        if category_key in categories:
-            category = categories[category_key]
+        if category_key in categories[transaction_type]:
+            category = categories["names"][categories[transaction_type][category_key]]
             print(f"Category set to: {Fore.GREEN}{category}{Fore.RESET}")
             break
         else:
-            print(f"{Fore.RED}Invalid category{Fore.RESET}. Please choose from {Fore.GREEN}{', '.join(categories.keys())}{Fore.RESET}.")
+            print(f"{Fore.RED}Invalid category{Fore.RESET}. Please choose from {categories['keys'][transaction_type]}.")
+
+    # Prompt for new currency
+    currency = input_currency("Enter the new currency")
 
     # Prompt for new amount
     while True:
         try:
-            amount = float(input("Enter the new amount:\n"))
+            amount = parse_amount(input("Enter the new amount:\n"))
             if amount <= 0:
                 raise ValueError(f"Amount must be a {Fore.GREEN}positive number{Fore.RESET}.")
-            print(f"Amount set to: {Fore.GREEN}{amount}{Fore.RESET}")
+            print(f"Amount set to: {Fore.GREEN}{format_amount(amount)}{Fore.RESET}")
             break
         except ValueError as e:
             print(f"{Fore.RED}Invalid input!{Fore.RESET} {e} Please enter a number for the amount.")
@@ -321,10 +1416,10 @@ def update_transaction():
     index = transactions.index(selected_transaction)
 
     # Update transaction
-    worksheet.update(
-        range_name=f'A{index+2}:E{index+2}',
-        values=[[date, transaction_type, category, amount, description]]
-    )
+    if not update_records("transactions", {index: [date, transaction_type, category, amount,
+                                                   description, currency]}):
+        print(ROWS_CHANGED)
+        return
     print(f"{Fore.GREEN}Transaction updated successfully!{Fore.RESET}")
 
 
@@ -349,7 +1444,6 @@ def delete_transaction():
 
     # Fetch transactions and filter by date
     transactions = get_transactions()
-    worksheet = SHEET.worksheet("transactions")
     transactions_on_date = [t for t in transactions if t["Date"] == date]
 
     if not transactions_on_date:
@@ -358,13 +1452,9 @@ def delete_transaction():
 
     # Display transactions on selected date
     print("Transactions on this date:")
-    print(f"{Fore.CYAN}-{Fore.RESET}" * 40)
+    print(SEPARATOR)
     for idx, transaction in enumerate(transactions_on_date, start=1):
-        print(f"{idx}. Date: {Fore.GREEN}{transaction['Date']}{Fore.RESET} | Type: "
-              f"{Fore.GREEN}{transaction['Type']}{Fore.RESET} | Category: "
-              f"{Fore.GREEN}{transaction['Category']}{Fore.RESET} | Amount: "
-              f"{Fore.GREEN}{transaction['Amount']}{Fore.RESET} | Description: "
-              f"{Fore.GREEN}{transaction['Description']}{Fore.RESET}")
+        print(f"{idx}. " + format_transaction(transaction))
 
     # Prompt for transaction number to delete
     while True:
@@ -380,18 +1470,16 @@ def delete_transaction():
             print(f"{Fore.RED}Invalid input{Fore.RESET}. Please enter a number.")
 
     # Confirm deletion
-    print(f"Selected transaction: Date: {Fore.GREEN}{selected_transaction['Date']}{Fore.RESET} | "
-          f"Type: {Fore.GREEN}{selected_transaction['Type']}{Fore.RESET} | Category: "
-          f"{Fore.GREEN}{selected_transaction['Category']}{Fore.RESET} | Amount: "
-          f"{Fore.GREEN}{selected_transaction['Amount']}{Fore.RESET} | Description: "
-          f"{Fore.GREEN}{selected_transaction['Description']}{Fore.RESET}")
+    print("Selected transaction: " + format_transaction(selected_transaction))
     confirm = input(f"Are you sure you want to delete this transaction? "
                     f"({Fore.GREEN}Y{Fore.RESET}/{Fore.RED}N{Fore.RESET}): ").upper()
     if confirm == 'Y':
         # Find the index of the transaction and delete.
         for i, transaction in enumerate(transactions):
             if transaction == selected_transaction:
-                worksheet.delete_rows(i + 2)
+                if not delete_records("transactions", i):
+                    print(ROWS_CHANGED)
+                    return
                 print(f"{Fore.GREEN}Transaction deleted successfully{Fore.RESET}!")
                 return
     else:
@@ -402,14 +1490,11 @@ def view_transactions():
     """
     Fetches and displays all transaction records from the 'transactions' worksheet
     for a specific month or year based on user input.
+    Large views are shown one page at a time.
     """
     # Prompt for view option
     while True:
-        print(f"{Fore.CYAN}-{Fore.RESET}" * 40)
-        print(f"{Fore.GREEN}1{Fore.RESET}. View transactions ({Fore.GREEN}Month{Fore.RESET})")
-        print(f"{Fore.GREEN}2{Fore.RESET}. View transactions ({Fore.GREEN}Year{Fore.RESET})")
-        print(f"{Fore.GREEN}3{Fore.RESET}. Back")
-        print(f"{Fore.CYAN}-{Fore.RESET}" * 40)
+        print(VIEW_MENU)
 
         # Handle user choice
         choice = input("Enter your choice:\n")
@@ -437,29 +1522,457 @@ def view_transactions():
                   f"{Fore.GREEN}{date_format}{Fore.RESET} format.")
 
     # Fetch and filter transactions
-    transactions = get_transactions()
-    filtered_transactions = []
-    for transaction in transactions:
-        transaction_date = datetime.strptime(transaction['Date'], "%Y-%m-%d")
-        if (date_format == "%Y-%m" and
-                transaction_date.strftime("%Y-%m") == selected_date.strftime("%Y-%m")):
-            filtered_transactions.append(transaction)
-        if (date_format == "%Y" and
-                transaction_date.strftime("%Y") == selected_date.strftime("%Y")):
-            filtered_transactions.append(transaction)
-
-    # Display filtered transactions
+    filtered_transactions = get_transactions_in_period(selected_date.strftime(date_format))
+
+    # Display filtered transactions, one page at a time
     if not filtered_transactions:
         print(f"{Fore.RED}No transactions found for the selected period.{Fore.RESET}")
         return
 
-    for transaction in filtered_transactions:
-        print(f"{Fore.CYAN}-{Fore.RESET}" * 40)
-        print(f"Date: {Fore.GREEN}{transaction['Date']}{Fore.RESET} | "
-              f"Type: {Fore.GREEN}{transaction['Type']}{Fore.RESET} | "
-              f"Category: {Fore.GREEN}{transaction['Category']}{Fore.RESET} | "
-              f"Amount: {Fore.GREEN}{transaction['Amount']}{Fore.RESET} | "
-              f"Description: {Fore.GREEN}{transaction['Description']}{Fore.RESET}")
+    show_pages(filtered_transactions,
+               lambda transaction: format_transaction(transaction, TRANSACTION_BLOCK))
+
+
+def recurring_date(start, frequency, n):
+    """
+    Returns the n-th occurrence of a recurring rule starting on 'start'.
+    Monthly and yearly rules keep the start day, clamped to the month length
+    (e.g. a rule starting on the 31st falls on the 28th/29th in February).
+    """
+    if frequency == "daily":
+        return start + timedelta(days=n)
+    if frequency == "weekly":
+        return start + timedelta(weeks=n)
+    months = n if frequency == "monthly" else 12 * n
+    year, month = divmod(start.month - 1 + months, 12)
+    year += start.year
+    day = min(start.day, calendar.monthrange(year, month + 1)[1])
+    return start.replace(year=year, month=month + 1, day=day)
+
+
+def due_dates(rule, today):
+    """
+    Returns the dates of all occurrences of a recurring rule that are due
+    after its last run, up to and including today (or its end date).
+    Skips straight to the last run instead of walking every past occurrence.
+    """
+    start = datetime.strptime(rule["Start Date"], "%Y-%m-%d")
+    frequency = rule["Frequency"]
+    until = today
+    if rule["End Date"]:
+        until = min(until, datetime.strptime(rule["End Date"], "%Y-%m-%d"))
+
+    n = 0
+    if rule["Last Run"]:
+        last_run = datetime.strptime(rule["Last Run"], "%Y-%m-%d")
+        if frequency == "daily":
+            n = (last_run - start).days
+        elif frequency == "weekly":
+            n = (last_run - start).days // 7
+        elif frequency == "monthly":
+            n = (last_run.year - start.year) * 12 + last_run.month - start.month
+        else:
+            n = last_run.year - start.year
+        n = max(0, n - 1)
+        while recurring_date(start, frequency, n) <= last_run:
+            n += 1
+
+    dates = []
+    while True:
+        date = recurring_date(start, frequency, n)
+        if date > until:
+            return dates
+        dates.append(date.strftime("%Y-%m-%d"))
+        n += 1
+
+
+def parse_rule(rule, location):
+    """
+    Checks a recurring rule from the 'recurring' worksheet, which can be
+    edited by hand. Frequency and type are matched in any case, and dates
+    must be 'YYYY-MM-DD' (end date and last run can be blank).
+    Rules with an amount that couldn't be read are left alone, so their row
+    isn't written back with an amount of 0 (a warning was shown on loading).
+    Returns the cleaned up rule, or None with a warning naming the given
+    location if it can't be used.
+    """
+    if not rule["Amount"]:
+        return None
+    rule = {**rule,
+            "Frequency": str(rule["Frequency"]).strip().lower(),
+            "Type": str(rule["Type"]).strip().lower(),
+            "Start Date": str(rule["Start Date"]).strip(),
+            "End Date": str(rule["End Date"]).strip(),
+            "Last Run": str(rule["Last Run"]).strip()}
+    problem = None
+    if rule["Frequency"] not in FREQUENCIES.values():
+        problem = f"frequency '{rule['Frequency']}'"
+    elif rule["Type"] not in ("income", "expense"):
+        problem = f"type '{rule['Type']}'"
+    else:
+        for column in ("Start Date", "End Date", "Last Run"):
+            if rule[column] or column == "Start Date":
+                try:
+                    datetime.strptime(rule[column], "%Y-%m-%d")
+                except ValueError:
+                    problem = f"{column.lower()} '{rule[column]}'"
+                    break
+    if problem:
+        print(f"{Fore.RED}Invalid {problem}{Fore.RESET} in {location}, rule skipped. "
+              f"Please correct it in Google Sheets.")
+        return None
+    return rule
+
+
+def apply_recurring_transactions():
+    """
+    Adds all occurrences of the recurring rules that are due since their last run.
+    All new transactions are sent to the 'transactions' worksheet in a single
+    append, then the 'Last Run' of each rule is updated in a single batch.
+    Occurrences already in the worksheet are skipped, so running it twice
+    (or after an interrupted run) never adds duplicates. A blank currency
+    counts as the base currency on both sides.
+    Rules that can't be used are skipped with a warning, and errors from
+    Google Sheets are reported instead of stopping the app.
+    """
+    rules = [parse_rule(rule, f"row {i + 2} of 'recurring'")
+             for i, rule in enumerate(get_records("recurring"))]
+    today = datetime.today()
+
+    due = [(i, due_dates(rule, today)) for i, rule in enumerate(rules) if rule]
+    due = [(i, dates) for i, dates in due if dates]
+    if not due:
+        return
+
+    existing = {(t["Date"], t["Type"], t["Category"], t["Amount"], str(t["Description"]),
+                 t["Currency"] or BASE_CURRENCY)
+                for t in get_transactions()}
+    new_rows = []
+    last_runs = {}
+    for i, dates in due:
+        rule = rules[i]
+        for date in dates:
+            row = [date, rule["Type"], rule["Category"], rule["Amount"],
+                   str(rule["Description"]), rule["Currency"] or BASE_CURRENCY]
+            if tuple(row) not in existing:
+                new_rows.append(row)
+        last_runs[i] = [dates[-1] if header == "Last Run" else rule[header]
+                        for header in RECURRING_HEADERS]
+
+    try:
+        if new_rows:
+            append_records("transactions", new_rows)
+        print(f"{Fore.GREEN}{len(new_rows)}{Fore.RESET} recurring transaction(s) added.")
+        if not update_records("recurring", last_runs):
+            print(ROWS_CHANGED)
+    except gspread.exceptions.APIError as error:
+        # Runs on startup, which shouldn't stop the app
+        print(f"{Fore.RED}Recurring transactions couldn't be saved{Fore.RESET}: {error}")
+
+
+def add_recurring_transaction():
+    """
+    Asks the user to enter the details of a recurring transaction.
+    Adds the rule to the 'recurring' worksheet and adds any occurrences
+    that are already due.
+    Automatically uses today's date as the start date if user presses enter.
+    An empty end date means the rule never ends.
+    """
+    # Prompt for start date
+    while True:
+        start_date = input(
+            f"Enter the start date ({Fore.GREEN}YYYY-MM-DD{Fore.RESET}) or press "
+            f"'{Fore.GREEN}Enter{Fore.RESET}' for today's date:\n")
+        if not start_date:
+            start_date = datetime.today().strftime("%Y-%m-%d")
+            print(f"Start date set to today's date: {Fore.GREEN}{start_date}{Fore.RESET}")
+            break
+        try:
+            datetime.strptime(start_date, "%Y-%m-%d")
+            print(f"Start date entered: {Fore.GREEN}{start_date}{Fore.RESET}")
+            break
+        except ValueError:
+            print(f"{Fore.RED}Invalid date format{Fore.RESET}. Please enter the date in "
+                  f"{Fore.GREEN}YYYY-MM-DD{Fore.RESET} format.")
+
+    # Prompt for frequency
+    while True:
+        frequency_key = input(
+            f"Enter the frequency: ({Fore.GREEN}D{Fore.RESET}) Daily, "
+            f"({Fore.GREEN}W{Fore.RESET}) Weekly, ({Fore.GREEN}M{Fore.RESET}) Monthly, "
+            f"({Fore.GREEN}Y{Fore.RESET}) Yearly:\n"
+        ).upper()
+        if frequency_key in FREQUENCIES:
+            frequency = FREQUENCIES[frequency_key]
+            print(f"Frequency set to: {Fore.GREEN}{frequency}{Fore.RESET}")
+            break
+        else:
+            print(f"{Fore.RED}Invalid frequency{Fore.RESET}. Please choose from "
+                  f"{Fore.GREEN}{', '.join(FREQUENCIES.keys())}{Fore.RESET}.")
+
+    # Prompt for transaction type
+    while True:
+        transaction_type = input(
+            f"Enter the type: ({Fore.GREEN}I{Fore.RESET}) Income, "
+            f"({Fore.GREEN}E{Fore.RESET}) Expense:\n"
+        ).upper()
+        if transaction_type in ["I", "E"]:
+            if transaction_type == "I":
+                transaction_type = "income"
+            else:
+                transaction_type = "expense"
+            print(f"Transaction type set to: {Fore.GREEN}{transaction_type}{Fore.RESET}")
+            break
+        else:
+            print(f"{Fore.RED}Invalid type{Fore.RESET}. Please enter "
+                  f"({Fore.GREEN}I{Fore.RESET}) for Income or ({Fore.GREEN}E{Fore.RESET}) for Expense.")
+
+    # Prompt for category
+    categories = get_categories()
+    while True:
+        category_key = input(
+            f"Enter the category: {categories['choices'][transaction_type]}:\n").upper()
+        if category_key in categories[transaction_type]:
+            category = categories["names"][categories[transaction_type][category_key]]
+            print(f"Category set to: {Fore.GREEN}{category}{Fore.RESET}")
+            break
+        else:
+            print(f"{Fore.RED}Invalid category{Fore.RESET}. Please choose from "
+                  f"{categories['keys'][transaction_type]}.")
+
+    # Prompt for currency
+    currency = input_currency("Enter the currency")
+
+    # Prompt for amount
+    while True:
+        try:
+            amount = parse_amount(input("Enter the amount:\n"))
+            if amount <= 0:
+                raise ValueError(f"Amount must be a {Fore.GREEN}positive number{Fore.RESET}.")
+            print(f"Amount set to: {Fore.GREEN}{format_amount(amount)}{Fore.RESET}")
+            break
+        except ValueError:
+            print(f"{Fore.RED}Invalid input!{Fore.RESET} Please enter a "
+                  f"{Fore.GREEN}positive number{Fore.RESET}.")
+
+    # Prompt for description
+    while True:
+        description = input("Enter the description:\n")
+        if description.strip():
+            print(f"Description entered: {Fore.GREEN}{description}{Fore.RESET}")
+            break
+        else:
+            print(f"{Fore.RED}Description cannot be empty{Fore.RESET}. Please enter a valid description.")
+
+    # Prompt for end date
+    while True:
+        end_date = input(
+            f"Enter the end date ({Fore.GREEN}YYYY-MM-DD{Fore.RESET}) or press "
+            f"'{Fore.GREEN}Enter{Fore.RESET}' for no end date:\n")
+        if not end_date:
+            print(f"End date: {Fore.GREEN}none{Fore.RESET}")
+            break
+        try:
+            if datetime.strptime(end_date, "%Y-%m-%d") < datetime.strptime(start_date, "%Y-%m-%d"):
+                print(f"{Fore.RED}End date cannot be before the start date{Fore.RESET}.")
+                continue
+            print(f"End date entered: {Fore.GREEN}{end_date}{Fore.RESET}")
+            break
+        except ValueError:
+            print(f"{Fore.RED}Invalid date format{Fore.RESET}. Please enter the date in "
+                  f"{Fore.GREEN}YYYY-MM-DD{Fore.RESET} format.")
+
+    # Confirm save
+    print(f"\nRecurring Summary - Start: {Fore.GREEN}{start_date}{Fore.RESET} | "
+          f"Frequency: {Fore.GREEN}{frequency}{Fore.RESET} | "
+          f"Type: {Fore.GREEN}{transaction_type}{Fore.RESET} | "
+          f"Category: {Fore.GREEN}{category}{Fore.RESET} | Amount: "
+          f"{Fore.GREEN}{format_amount(amount)} {currency}{Fore.RESET} | Description: "
+          f"{Fore.GREEN}{description}{Fore.RESET} | "
+          f"End: {Fore.GREEN}{end_date or 'none'}{Fore.RESET}\n")
+    confirm = input(f"Do you want to save this recurring transaction? "
+                    f"({Fore.GREEN}Y{Fore.RESET}/{Fore.RED}N{Fore.RESET}): ").upper()
+    if confirm != 'Y':
+        print(f"{Fore.RED}Recurring transaction not saved.{Fore.RESET}")
+        return
+
+    append_records("recurring", [[start_date, frequency, transaction_type, category,
+                                  amount, description, end_date, "", currency]])
+    print(f"{Fore.GREEN}Recurring transaction added successfully!{Fore.RESET}")
+    apply_recurring_transactions()
+
+
+def view_recurring_transactions():
+    """
+    Displays all rules from the 'recurring' worksheet.
+    """
+    rules = get_records("recurring")
+    if not rules:
+        print(f"{Fore.RED}No recurring transactions found.{Fore.RESET}")
+        return
+
+    for rule in rules:
+        print(SEPARATOR)
+        print(f"Start: {Fore.GREEN}{rule['Start Date']}{Fore.RESET} | "
+              f"Frequency: {Fore.GREEN}{rule['Frequency']}{Fore.RESET} | "
+              f"Type: {Fore.GREEN}{rule['Type']}{Fore.RESET} | "
+              f"Category: {Fore.GREEN}{rule['Category']}{Fore.RESET} | "
+              f"Amount: {Fore.GREEN}{format_amount(rule['Amount'])} {rule['Currency']}{Fore.RESET} | "
+              f"Description: {Fore.GREEN}{rule['Description']}{Fore.RESET} | "
+              f"End: {Fore.GREEN}{rule['End Date'] or 'none'}{Fore.RESET} | "
+              f"Last Run: {Fore.GREEN}{rule['Last Run'] or 'never'}{Fore.RESET}")
+
+
+def undo_last_change():
+    """
+    Undoes the last change made to transactions through the app.
+    Shows the change and asks for confirmation first.
+    Changes whose rows were changed outside the app since are reported and
+    skipped, moving on to the change before.
+    """
+    operations = get_operations()
+    seq = next_operation("undo", "after")
+    if seq is None:
+        print(f"{Fore.RED}Nothing to undo.{Fore.RESET}")
+        return
+    entry = operations["entries"][seq]
+
+    print(f"Last change ({Fore.GREEN}{entry['time']}{Fore.RESET}): {entry['op']}")
+    show_operation(entry)
+    confirm = input(f"Do you want to undo this change? "
+                    f"({Fore.GREEN}Y{Fore.RESET}/{Fore.RED}N{Fore.RESET}): ").upper()
+    if confirm != 'Y':
+        print(f"{Fore.RED}Change not undone.{Fore.RESET}")
+        return
+
+    # Apply the opposite operation
+    if entry["op"] == "insert":
+        done = delete_records("transactions", entry["index"], len(entry["after"]), "undo", seq)
+    elif entry["op"] == "delete":
+        done = insert_records("transactions", entry["index"], entry["before"], "undo", seq)
+    else:
+        done = update_records("transactions", {entry["index"]: entry["before"][0]}, "undo", seq)
+    if not done:
+        print(ROWS_CHANGED)
+        return
+    print(f"{Fore.GREEN}Change undone successfully!{Fore.RESET}")
+
+
+def redo_last_change():
+    """
+    Makes the last undone change to transactions again.
+    Shows the change and asks for confirmation first.
+    Changes whose rows were changed outside the app since are reported and
+    skipped, moving on to the change before.
+    """
+    operations = get_operations()
+    seq = next_operation("redo", "before")
+    if seq is None:
+        print(f"{Fore.RED}Nothing to redo.{Fore.RESET}")
+        return
+    entry = operations["entries"][seq]
+
+    print(f"Last undone change ({Fore.GREEN}{entry['time']}{Fore.RESET}): {entry['op']}")
+    show_operation(entry)
+    confirm = input(f"Do you want to redo this change? "
+                    f"({Fore.GREEN}Y{Fore.RESET}/{Fore.RED}N{Fore.RESET}): ").upper()
+    if confirm != 'Y':
+        print(f"{Fore.RED}Change not redone.{Fore.RESET}")
+        return
+
+    # Apply the operation again
+    if entry["op"] == "insert":
+        done = insert_records("transactions", entry["index"], entry["after"], "redo", seq)
+    elif entry["op"] == "delete":
+        done = delete_records("transactions", entry["index"], len(entry["before"]), "redo", seq)
+    else:
+        done = update_records("transactions", {entry["index"]: entry["after"][0]}, "redo", seq)
+    if not done:
+        print(ROWS_CHANGED)
+        return
+    print(f"{Fore.GREEN}Change redone successfully!{Fore.RESET}")
+
+
+def next_operation(stack, rows):
+    """
+    Gets the number of the last operation on the given stack ('undo' or
+    'redo') whose rows ('after' or 'before' it) are still in place.
+    Operations whose rows were changed outside the app are reported and
+    skipped for good. The transactions are loaded again once before that,
+    in case the loaded ones are out of date.
+    Returns None if no operation is left.
+    """
+    operations = get_operations()
+    reloaded = False
+    while operations[stack]:
+        seq = operations[stack][-1]
+        entry = operations["entries"][seq]
+        if rows_match(entry["index"], entry[rows]):
+            return seq
+        if not reloaded:
+            reload_ledger()
+            reloaded = True
+            continue
+        print(f"{Fore.RED}Skipping the change from {entry['time']}{Fore.RESET}: "
+              f"its transactions were changed outside the app since.")
+        skip_operation(seq)
+    return None
+
+
+def rows_match(index, rows):
+    """
+    Checks that the transactions from the given index are still the given rows.
+    """
+    transactions = get_transactions()
+    if index > len(transactions):
+        return False
+    return [record_row("transactions", record)
+            for record in transactions[index:index + len(rows)]] == rows
+
+
+def show_operation(entry):
+    """
+    Displays the transactions before and after a logged operation.
+    """
+    for label, rows in (("Before", entry["before"]), ("After", entry["after"])):
+        for row in rows:
+            print(f"{label}: " + format_transaction(dict(zip(TRANSACTION_HEADERS, row))))
+
+
+def view_transactions_as_of():
+    """
+    Asks the user for a date and time, and displays all transactions as they
+    were at that moment, rebuilt from the operation log.
+    Uses the end of the day if only a date is entered.
+    """
+    while True:
+        time_input = input(f"Enter the date ({Fore.GREEN}YYYY-MM-DD{Fore.RESET}) or date and time "
+                           f"({Fore.GREEN}YYYY-MM-DD HH:MM{Fore.RESET}):\n").strip()
+        try:
+            if len(time_input) == 10:
+                time = datetime.strptime(time_input, "%Y-%m-%d").replace(hour=23, minute=59,
+                                                                           second=59)
+            else:
+                time = datetime.strptime(time_input, "%Y-%m-%d %H:%M").replace(second=59)
+            break
+        except ValueError:
+            print(f"{Fore.RED}Invalid date format{Fore.RESET}. Please enter the date in "
+                  f"{Fore.GREEN}YYYY-MM-DD{Fore.RESET} or {Fore.GREEN}YYYY-MM-DD HH:MM{Fore.RESET} format.")
+
+    transactions = get_ledger_as_of(time.isoformat(timespec="seconds"))
+    if transactions is None:
+        checkpoints = get_operations()["checkpoints"]
+        if checkpoints:
+            print(f"{Fore.RED}No history before {checkpoints[0]['time']}.{Fore.RESET}")
+        else:
+            print(f"{Fore.RED}No history yet{Fore.RESET}. It starts with the next change.")
+        return
+    if not transactions:
+        print(f"{Fore.RED}No transactions at that time.{Fore.RESET}")
+        return
+
+    show_pages(transactions,
+               lambda transaction: format_transaction(transaction, TRANSACTION_BLOCK))
 
 
 def generate_report():
@@ -467,15 +1980,12 @@ def generate_report():
     Generates and displays a financial report based on the transactions and budget data
     for a specific month or year based on user input.
     Calculates total income, expenses, savings, and compares spending against budget limits.
+    Amounts in other currencies are converted to the base currency.
     Uses colorama for colored output to enhance user experience.
     """
     while True:
         # Display menu options for report generation
-        print(f"{Fore.CYAN}-{Fore.RESET}" * 40)
-        print(f"{Fore.GREEN}1{Fore.RESET}. Generate report ({Fore.GREEN}Month{Fore.RESET})")
-        print(f"{Fore.GREEN}2{Fore.RESET}. Generate report ({Fore.GREEN}Year{Fore.RESET})")
-        print(f"{Fore.GREEN}3{Fore.RESET}. Back")
-        print(f"{Fore.CYAN}-{Fore.RESET}" * 40)
+        print(REPORT_MENU)
 
         # Get user choice for report type
         choice = input("Enter your choice:\n")
@@ -502,65 +2012,114 @@ def generate_report():
             print(f"{Fore.RED}Invalid date format{Fore.RESET}. Please enter the date in "
                   f"{Fore.GREEN}{date_format}{Fore.RESET} format.")
 
-    # Fetch all transactions
-    transactions = get_transactions()
-    filtered_transactions = []
-
-    # Filter transactions based on user input (month or year)
-    for transaction in transactions:
-        transaction_date = datetime.strptime(transaction['Date'], "%Y-%m-%d")
-        if (date_format == "%Y-%m" and
-                transaction_date.strftime("%Y-%m") == selected_date.strftime("%Y-%m")):
-            filtered_transactions.append(transaction)
-        if (date_format == "%Y" and
-                transaction_date.strftime("%Y") == selected_date.strftime("%Y")):
-            filtered_transactions.append(transaction)
+    # Fetch transactions based on user input (month or year)
+    period = selected_date.strftime(date_format)
+    filtered_transactions = get_transactions_in_period(period)
 
     if not filtered_transactions:
         print(f"{Fore.RED}No transactions found for the selected period.{Fore.RESET}")
         return
 
     # Fetch budget data
-    budget_data = SHEET.worksheet("budget").get_all_records()
-
-    # Calculate totals
-    income = sum(float(t['Amount']) for t in filtered_transactions if t['Type'] == 'income')
-    expenses = sum(float(t['Amount']) for t in filtered_transactions if t['Type'] == 'expense')
+    budget_data = get_records("budget")
+
+    # Add up amounts in cents by currency, date (not needed for the base
+    # currency) and category code (None for income) in a single pass
+    budget_codes = [category_code(category['Category']) for category in budget_data]
+    expense_codes = [category_code(t['Category']) if t['Type'] == 'expense' else None
+                     for t in filtered_transactions]
+    totals = {}
+    for transaction, code in zip(filtered_transactions, expense_codes):
+        if code is None and transaction['Type'] != 'income':
+            continue
+        currency = transaction['Currency'] or BASE_CURRENCY
+        date = transaction['Date'] if currency != BASE_CURRENCY else ""
+        key = (currency, date, code)
+        totals[key] = totals.get(key, 0) + transaction['Amount']
+
+    # Convert to the base currency, one batch per currency
+    converted, missing = convert_totals(totals)
+    categories = get_categories()
+    spent = [0] * (len(categories["names"]) + len(categories["other"]))
+    income = 0
+    expenses = 0
+    for code, amount in converted:
+        if code is None:
+            income += amount
+        else:
+            spent[code] += amount
+            expenses += amount
     savings = income - expenses
 
     # Display report
-    print(f"{Fore.CYAN}-{Fore.RESET}" * 40)
-    print(f"Total Income: {Fore.GREEN}{income}{Fore.RESET} | Total Expenses: "
-          f"{Fore.RED}{expenses}{Fore.RESET} | Savings: {Fore.CYAN}{savings}{Fore.RESET}")
-
-    # Display budget summary
-    print(f"{Fore.CYAN}-{Fore.RESET}" * 40)
+    print(SEPARATOR)
+    print(f"Total Income: {Fore.GREEN}{format_amount(income)}{Fore.RESET} | Total Expenses: "
+          f"{Fore.RED}{format_amount(expenses)}{Fore.RESET} | "
+          f"Savings: {Fore.CYAN}{format_amount(savings)}{Fore.RESET} "
+          f"({BASE_CURRENCY})")
+    if missing:
+        print(f"{Fore.RED}No exchange rates for {', '.join(sorted(missing))}{Fore.RESET}: "
+              f"some transactions are left out. Add rates to {FX_RATES_FILE}.")
+
+    # Display budget summary, converting limits at the rate of the period's last day
+    if date_format == "%Y-%m":
+        last_day = calendar.monthrange(selected_date.year, selected_date.month)[1]
+        period_end = f"{period}-{last_day:02d}"
+    else:
+        period_end = f"{period}-12-31"
+    print(SEPARATOR)
     print("Budget Summary:")
-    print(f"{Fore.CYAN}-{Fore.RESET}" * 40)
-    for category in budget_data:
-        category_expenses = sum(float(t['Amount']) for t in filtered_transactions
-                                if t['Category'] == category['Category'] and t['Type'] == 'expense')
-        remaining_budget = float(category['Limit']) - category_expenses
-        print(f"{category['Category']} | Spent: {Fore.RED}{category_expenses}{Fore.RESET} | "
-              f"Budget Limit: {Fore.GREEN}{category['Limit']}{Fore.RESET} | "
-              f"Remaining: {Fore.CYAN}{remaining_budget}{Fore.RESET}")
+    print(SEPARATOR)
+    for category, code in zip(budget_data, budget_codes):
+        category_expenses = spent[code]
+        currency = category['Currency'] or BASE_CURRENCY
+        rate = get_fx_rate(currency, period_end)
+        if rate is None:
+            print(f"{category['Category']} | Spent: {Fore.RED}{format_amount(category_expenses)}{Fore.RESET} | "
+                  f"Budget Limit: {Fore.GREEN}{format_amount(category['Limit'])} {currency}{Fore.RESET} | "
+                  f"{Fore.RED}No exchange rate for {currency}{Fore.RESET}")
+            continue
+        limit = convert_cents(category['Limit'], rate)
+        remaining_budget = limit - category_expenses
+        print(f"{category['Category']} | Spent: {Fore.RED}{format_amount(category_expenses)}{Fore.RESET} | "
+              f"Budget Limit: {Fore.GREEN}{format_amount(limit)}{Fore.RESET} | "
+              f"Remaining: {Fore.CYAN}{format_amount(remaining_budget)}{Fore.RESET}")
+
+
+def recurring_menu():
+    """
+    Sub-menu for recurring transactions.
+    Provides options to add or view recurring transactions, add the ones
+    that are due, or go back to the transactions menu.
+    """
+    # Display menu options
+    while True:
+        print(RECURRING_MENU)
+
+        # Handle user choice
+        choice = input("Enter your choice:\n")
+        if choice == "1":
+            add_recurring_transaction()
+        elif choice == "2":
+            view_recurring_transactions()
+        elif choice == "3":
+            apply_recurring_transactions()
+        elif choice == "4":
+            break
+        else:
+            print(f"{Fore.RED}Invalid choice{Fore.RESET}. Please try again.")
 
 
 def transactions_menu():
     """
     Sub-menu for viewing and editing transactions.
-    Provides options to add, delete, view transactions, or go back to the main menu.
+    Provides options to add, delete, view transactions, manage recurring
+    transactions, undo or redo changes, view transactions as of a date,
+    or go back to the main menu.
     """
     # Display menu options
     while True:
-        print(f"{Fore.CYAN}-{Fore.RESET}" * 40)
-        print("Transactions Menu:")
-        print(f"{Fore.GREEN}1{Fore.RESET}. Add transaction")
-        print(f"{Fore.GREEN}2{Fore.RESET}. Update transaction")
-        print(f"{Fore.GREEN}3{Fore.RESET}. Delete transaction")
-        print(f"{Fore.GREEN}4{Fore.RESET}. View Transactions")
-        print(f"{Fore.GREEN}5{Fore.RESET}. Back")
-        print(f"{Fore.CYAN}-{Fore.RESET}" * 40)
+        print(TRANSACTIONS_MENU)
 
         # Handle user choice
         choice = input("Enter your choice:\n")
@@ -573,6 +2132,14 @@ def transactions_menu():
         elif choice == "4":
             view_transactions()
         elif choice == "5":
+            recurring_menu()
+        elif choice == "6":
+            undo_last_change()
+        elif choice == "7":
+            redo_last_change()
+        elif choice == "8":
+            view_transactions_as_of()
+        elif choice == "9":
             break
         else:
             print(f"{Fore.GREEN}Invalid choice{Fore.RESET}. Please try again.")
@@ -582,16 +2149,11 @@ def main():
     """
     Main function. Handles menu and user choices.
     Provides options to set budget, add transaction, update transaction, delete transaction,
-    view transactions, and generate report.
+    view transactions, generate report, and add category.
     """
     # Display main menu options
     while True:
-        print(f"{Fore.CYAN}-{Fore.RESET}" * 40)
-        print(f"{Fore.GREEN}1{Fore.RESET}. Set budget")
-        print(f"{Fore.GREEN}2{Fore.RESET}. View/Edit transactions")
-        print(f"{Fore.GREEN}3{Fore.RESET}. Generate report")
-        print(f"{Fore.GREEN}4{Fore.RESET}. Exit")
-        print(f"{Fore.CYAN}-{Fore.RESET}" * 40)
+        print(MAIN_MENU)
 
         # Handle user choice
         choice = input("Enter your choice:\n")
@@ -602,13 +2164,16 @@ def main():
         elif choice == "3":
             generate_report()
         elif choice == "4":
-            print(f"{Fore.CYAN}-{Fore.RESET}" * 40)
+            add_category()
+        elif choice == "5":
+            print(SEPARATOR)
             print("Goodbye!")
             break
         else:
             print(f"{Fore.RED}Invalid choice{Fore.RESET}. Please try again.")
 
 
-# Welcome message and start main function
+# Welcome message, add due recurring transactions and start main function
 print(f"Welcome to {Fore.GREEN}Smart Budget{Fore.RESET}!")
+apply_recurring_transactions()
 main()